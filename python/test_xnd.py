@@ -30,10 +30,11 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #
 
-import sys, unittest, argparse
+import sys, types, unittest, argparse
+from unittest import mock
 from math import isinf, isnan
 from ndtypes import ndt, typedef
-from xnd import xnd, XndEllipsis, data_shapes
+from xnd import xnd, array, XndEllipsis, data_shapes, typeof
 from xnd._xnd import _test_view_subscript, _test_view_new
 from xnd_support import *
 from xnd_randvalue import *
@@ -1862,6 +1863,25 @@ class TestCategorical(XndTestCase):
         y = xnd(['August', None, 'August'], type=t)
         self.assertNotStrictEqual(x, y)
 
+    def test_categorical_levels(self):
+        v = ['a', 'b', None, 'a']
+        t = ndt("4 * categorical('a', 'b', NA)")
+
+        x = xnd(v, levels=['a', 'b', None])
+        self.assertEqual(x.type, t)
+        self.assertEqual(x.value, v)
+
+        # Iterables without a length are materialized once.
+        x = xnd(iter(v), levels=['a', 'b', None])
+        self.assertEqual(x.type, t)
+        self.assertEqual(x.value, v)
+
+        # Levels that compare equal but are formatted differently get
+        # distinct types.
+        for levels in [[1, 'a'], [True, 'a'], [1.0, 'a']]:
+            x = xnd(['a'], levels=levels)
+            self.assertEqual(x.type, ndt("1 * categorical('%s', 'a')" % levels[0]))
+
 
 class TestFixedStringKind(XndTestCase):
 
@@ -2933,6 +2953,22 @@ class TestTypeInference(XndTestCase):
         for v in not_implemented:
             self.assertRaises(NotImplementedError, xnd, v)
 
+    def test_typeof_xnd(self):
+        test_cases = [
+          xnd(10),
+          xnd([[1, 2], [3]]),
+          xnd({'a': "xyz", 'b': [1, 2, 3]}),
+          xnd([1, 2, 3], type="3 * uint8")[1:],
+          xnd([1, 2, 3, 4, 5], type="5 * int64")[::2]
+        ]
+
+        for x in test_cases:
+            self.assertEqual(typeof(x), x.type)
+
+        # The constructor does not infer types from xnd values.
+        for x in test_cases:
+            self.assertRaises(ValueError, xnd, x)
+
 
 class TestIndexing(XndTestCase):
 
@@ -3015,6 +3051,14 @@ class TestAPI(XndTestCase):
         x = xnd([1, 2, 3])
         self.assertRaises(TypeError, hash, x)
 
+    def test_slots(self):
+        x = xnd([1, 2, 3])
+        self.assertFalse(hasattr(x, "__dict__"))
+        self.assertRaises(AttributeError, setattr, x, "foo", 1)
+
+        # Views have the same type.
+        self.assertFalse(hasattr(x[1:], "__dict__"))
+
     def test_short_value(self):
         x = xnd([1, 2])
         self.assertEqual(x.short_value(0), [])
@@ -3045,6 +3089,24 @@ class TestAPI(XndTestCase):
         self.assertRaises(ValueError, x.short_value, -1)
 
 
+class TestEmpty(XndTestCase):
+
+    def test_empty_many(self):
+        lst = xnd.empty_many("2 * 3 * int64", 3)
+        self.assertEqual(len(lst), 3)
+        for x in lst:
+            self.assertEqual(x.type, ndt("2 * 3 * int64"))
+            self.assertEqual(x, [[0, 0, 0], [0, 0, 0]])
+
+        # The memory blocks are independent.
+        lst[0][0, 0] = 10
+        self.assertEqual(lst[0][0, 0], 10)
+        self.assertEqual(lst[1][0, 0], 0)
+
+        self.assertEqual(xnd.empty_many(ndt("int8"), 0), [])
+        self.assertRaises(ValueError, xnd.empty_many, "Foo:: int64", 2)
+
+
 class TestRepr(XndTestCase):
 
     def test_repr(self):
@@ -3151,6 +3213,25 @@ class TestBuffer(XndTestCase):
         y = xnd.from_buffer(x)
         self.assertEqual(memoryview(y).format, "=Zd")
 
+    @unittest.skipIf(np is None, "numpy not found")
+    def test_from_numpy(self):
+        x = np.array([[1, 2, 3], [4, 5, 6]], dtype="float32")
+        y = array.from_numpy(x)
+        self.assertIsInstance(y, array)
+        self.assertEqual(y.type, ndt("2 * 3 * float32"))
+        self.assertEqual(y.value, x.tolist())
+
+        # The memory is shared.
+        x[0, 0] = 10
+        self.assertEqual(y.value[0][0], 10)
+
+        # Byte-swapped arrays go through the buffer protocol.
+        x = np.array([1, 2, 3], dtype=">i4")
+        y = array.from_numpy(x)
+        self.assertEqual(y.value, [1, 2, 3])
+
+        self.assertRaises(TypeError, array.from_numpy, [1, 2, 3])
+
 
 class TestReshape(XndTestCase):
 
@@ -3158,6 +3239,12 @@ class TestReshape(XndTestCase):
         x = xnd([[1,2,3], [4,5,6]], type="!2 * 3 * float32")
         self.assertRaises(ValueError, x.reshape, 2**32, 2**32)
 
+    def test_reshape_tuple(self):
+        x = xnd([[1,2,3], [4,5,6]], type="!2 * 3 * float32")
+        y = x.reshape((3,2))
+        self.assertEqual(y, [[1,2], [3,4], [5,6]])
+        self.assertEqual(y, x.reshape(3,2))
+
     def test_reshape_fortran(self):
         x = xnd([[1,2,3], [4,5,6]], type="!2 * 3 * float32")
         y = x.reshape(3,2,order='F')
@@ -3286,6 +3373,183 @@ class TestCopy(XndTestCase):
         self.assertRaises(ValueError, x.copy_contiguous, dtype="int8")
 
 
+class TestArray(XndTestCase):
+
+    def stub_gumath(self, *names):
+        """Route the array methods to a stub gumath.functions module whose
+           kernels return their own name.  All dispatch tables are restored
+           after the test.
+        """
+        from xnd import _MODULES
+
+        def kernel(name):
+            def f(*args, out=None, cls=None):
+                return name
+            return f
+
+        functions = types.ModuleType("gumath.functions")
+        for name in names:
+            setattr(functions, name, kernel(name))
+        gumath = types.ModuleType("gumath")
+        gumath.functions = functions
+
+        patches = [
+          mock.patch.dict(sys.modules, {"gumath": gumath,
+                                        "gumath.functions": functions}),
+          mock.patch.dict(_MODULES, clear=True),
+          mock.patch.dict(array._bound, clear=True),
+          mock.patch.dict(array._bound_contig, clear=True)
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+        return functions
+
+    def test_generated_methods(self):
+        class A(array):
+            def _call_unary(self, name, out=None):
+                return name
+
+        x = A([1.0, 2.0])
+        self.assertIsNot(array.tanh, array.tgamma)
+        self.assertEqual(array.tanh.__name__, "tanh")
+        self.assertEqual(array.tgamma.__name__, "tgamma")
+        self.assertEqual(x.tanh(), "tanh")
+        self.assertEqual(x.tgamma(), "tgamma")
+
+    def test_pos(self):
+        # +a is a zero-copy view that shares the memory of a.
+        a = array([1, 2, 3])
+        b = +a
+        self.assertIs(type(b), array)
+        self.assertIsNot(b, a)
+        self.assertEqual(b.value, [1, 2, 3])
+
+        b[0] = 10
+        self.assertEqual(a.value, [10, 2, 3])
+
+    def test_shape_strides(self):
+        a = array([[1, 2], [3, 4]])
+        self.assertEqual(a.shape, (2, 2))
+        self.assertEqual(a.strides, (16, 8))
+
+        b = a[1:]
+        self.assertEqual(b.shape, (1, 2))
+        self.assertEqual(b.strides, (16, 8))
+
+        # The tuples are computed once per object.
+        self.assertIs(a.shape, a.shape)
+        self.assertIs(a.strides, a.strides)
+        self.assertIs(b.shape, b.shape)
+        self.assertIs(b.strides, b.strides)
+
+    def test_contiguous_kernels(self):
+        self.stub_gumath("add", "add_contig", "multiply")
+        a = array([1, 2, 3])
+        b = array([4, 5, 6])
+
+        # Same shape, C-contiguous, no 'out' argument.
+        self.assertEqual(a + b, "add_contig")
+
+        # Different shapes.
+        self.assertEqual(a + array([1]), "add")
+
+        # Not C-contiguous.
+        c = array([1, 2, 3, 4, 5, 6])[::2]
+        self.assertFalse(c.type.is_c_contiguous())
+        self.assertEqual(a + c, "add")
+        self.assertEqual(c + a, "add")
+
+        # Explicit 'out' argument.
+        self.assertEqual(a._call_binary("add", b, out=a), "add")
+        self.assertEqual(a.__iadd__(b), "add")
+
+        # No contiguous kernel for this function.
+        self.assertEqual(a * b, "multiply")
+
+    def test_dispatch_tables(self):
+        from xnd import _MODULES
+        functions = self.stub_gumath("add", "sin")
+        a = array([1.0, 2.0])
+
+        self.assertEqual(a + a, "add")
+        self.assertEqual(a.sin(), "sin")
+
+        # One entry per tuple of operand devices.
+        self.assertIs(_MODULES[(None,)], functions)
+        self.assertIs(_MODULES[(None, None)], functions)
+        self.assertIs(array._bound[(None, None), "add"], functions.add)
+        self.assertIs(array._bound[(None,), "sin"], functions.sin)
+        self.assertNotIn(((None,), "cos"), array._bound)
+
+        # The bound functions are used without looking at the module again.
+        add = functions.add
+        functions.add = lambda *args, out=None, cls=None: "replaced"
+        self.assertEqual(a + a, "add")
+        self.assertIs(array._bound[(None, None), "add"], add)
+
+        # Names missing from the tables fall back to getattr().
+        self.assertRaises(AttributeError, a.cos)
+        functions.cos = lambda *args, out=None, cls=None: "cos"
+        self.assertEqual(a.cos(), "cos")
+
+    @unittest.skipIf(np is None, "numpy not found")
+    def test_array_ufunc_result(self):
+        a = array([1.0, 2.0])
+        b = array([3.0, 4.0])
+
+        x = np.add(a, b)
+        self.assertIs(type(x), array)
+        self.assertEqual(x.type, ndt("2 * float64"))
+        self.assertEqual(x.value, [4.0, 6.0])
+
+        x = np.less(a, b)
+        self.assertIs(type(x), array)
+        self.assertEqual(x.type, ndt("2 * bool"))
+        self.assertEqual(x.value, [True, True])
+
+        # Multiple results are returned as a tuple of xnd objects.
+        q, r = np.divmod(array([7.0, 8.0]), array([2.0, 3.0]))
+        self.assertIs(type(q), xnd)
+        self.assertIs(type(r), xnd)
+        self.assertEqual(q.value, [3.0, 2.0])
+        self.assertEqual(r.value, [1.0, 2.0])
+
+        # NumPy returns a scalar for 0-d inputs.
+        c = array(2.0)
+        x = np.add(c, c)
+        self.assertIs(type(x), array)
+        self.assertEqual(x.type, ndt("float64"))
+        self.assertEqual(x.value, 4.0)
+
+        # Results that are not C-contiguous go through from_buffer().
+        c = array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+        x = np.add(c, c, order='F')
+        self.assertIs(type(x), array)
+        self.assertTrue(x.type.is_f_contiguous())
+        self.assertEqual(x.value, [[2.0, 4.0, 6.0], [8.0, 10.0, 12.0]])
+
+    @unittest.skipIf(np is None, "numpy not found")
+    def test_array_ufunc_out(self):
+        a = array([1.0, 2.0])
+        b = array([3.0, 4.0])
+        c = array([0.0, 0.0])
+
+        out = (c,)
+        x = np.add(a, b, out=out)
+        self.assertIsInstance(x, tuple)
+        self.assertEqual(len(x), 1)
+        self.assertIs(x[0], c)
+        self.assertEqual(c.value, [4.0, 6.0])
+
+        with self.assertRaisesRegex(TypeError, "all inputs"):
+            np.add(a, np.array([3.0, 4.0]))
+
+        with self.assertRaisesRegex(TypeError, "all outputs"):
+            np.add(a, b, out=(np.zeros(2),))
+
+
 class TestSpec(XndTestCase):
 
     def __init__(self, *, constr, ndarray,
@@ -3616,6 +3880,7 @@ ALL_TESTS = [
   TestIndexing,
   TestSequence,
   TestAPI,
+  TestEmpty,
   TestRepr,
   TestBuffer,
   TestReshape,
@@ -3623,6 +3888,7 @@ ALL_TESTS = [
   TestTranspose,
   TestView,
   TestCopy,
+  TestArray,
   LongIndexSliceTest,
 ]
 
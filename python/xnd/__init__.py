@@ -43,15 +43,68 @@ data.
 Importing PEP-3118 buffers is supported.
 """
 
+from functools import lru_cache
 
 # Ensure that libndtypes is loaded and initialized.
 from ndtypes import ndt, instantiate, MAX_DIM
 from ._xnd import Xnd, XndEllipsis, data_shapes, _typeof
-from .contrib.pretty import pretty
 
 __all__ = ['xnd', 'array', 'XndEllipsis', 'typeof']
 
 
+def __getattr__(name):
+    # The pretty printer is only needed for repr() and is imported on first use.
+    if name == "pretty":
+        from .contrib.pretty import pretty
+        globals()["pretty"] = pretty
+        return pretty
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+# ======================================================================
+#                           Cached type parsing
+# ======================================================================
+
+@lru_cache(maxsize=1024)
+def _ndt_cached(s):
+    """Return ndt(s).  ndt objects are immutable, so repeated construction
+       from the same type string can reuse the result of the first parse.
+    """
+    return ndt(s)
+
+def _cat_type(levels, n):
+    """Return the type of a categorical array of length 'n' with the given
+       levels.  Only the parse is cached: levels that compare equal can
+       format differently (1, 1.0, True), so they cannot be cache keys.
+    """
+    args = ', '.join("'%s'" % l if l is not None else 'NA' for l in levels)
+    return _ndt_cached("%d * categorical(%s)" % (n, args))
+
+@lru_cache(maxsize=32)
+def _parse_device(s):
+    """Convert a device string like "cuda:managed" to the (name, no) tuple
+       expected by the constructors.
+    """
+    i = s.rfind(":")
+    if i < 0:
+        raise ValueError("device must be of the form 'name:no', got '%s'" % s)
+    name, no = s[:i], s[i+1:]
+    return (name, -1 if no == "managed" else int(no))
+
+def _format_repr(x, name):
+    """Shared implementation of xnd.__repr__ and array.__repr__.  The result
+       is not cached: the memory of an xnd object can be changed through
+       assignment, views, exported buffers or 'out' arguments.
+    """
+    pretty = globals().get("pretty") or __getattr__("pretty")
+    value = x.short_value(maxshape=10)
+    fmt = pretty((value, "@type='%s'@" % x.type), max_width=120)
+    fmt = fmt.replace('"@', "")
+    fmt = fmt.replace('@"', "")
+    fmt = fmt.replace("\n", "\n" + " " * len(name))
+    return name + fmt
+
+
 # ======================================================================
 #                              xnd object
 # ======================================================================
@@ -97,65 +150,81 @@ class xnd(Xnd):
            xnd([49, 50, 51], type="3 * uint8")
     """
 
+    # No per-instance __dict__.  The weakref slot keeps xnd objects usable
+    # as weak references, the C base type does not provide one.
+    __slots__ = ("__weakref__",)
+
     def __new__(cls, value, *, type=None, dtype=None, levels=None,
                 typedef=None, dtypedef=None, device=None):
-        if (type, dtype, levels, typedef, dtypedef).count(None) < 2:
+        if ((type is not None) + (dtype is not None) + (levels is not None) +
+            (typedef is not None) + (dtypedef is not None)) > 1:
             raise TypeError(
                 "the 'type', 'dtype', 'levels' and 'typedef' arguments are "
                 "mutually exclusive")
         if type is not None:
             if isinstance(type, str):
-                type = ndt(type)
+                type = _ndt_cached(type)
         elif dtype is not None:
             type = typeof(value, dtype=dtype)
         elif levels is not None:
-            args = ', '.join("'%s'" % l if l is not None else 'NA' for l in levels)
-            t = "%d * categorical(%s)" % (len(value), args)
-            type = ndt(t)
+            if not hasattr(value, "__len__"):
+                value = list(value)
+            type = _cat_type(levels, len(value))
         elif typedef is not None:
-            type = ndt(typedef)
+            type = _ndt_cached(typedef)
             if type.isabstract():
                 dtype = type.hidden_dtype
                 t = typeof(value, dtype=dtype)
                 type = instantiate(typedef, t)
         elif dtypedef is not None:
-            dtype = ndt(dtypedef)
+            dtype = _ndt_cached(dtypedef)
             type = typeof(value, dtype=dtype)
         else:
-            type = typeof(value)
+            # Not typeof(): the constructor does not accept xnd values, and
+            # the type of a strided view is not a valid allocation type.
+            type = _typeof(value, dtype=None, shortcut=True)
 
         if device is not None:
-            name, no = device.split(":")
-            no = -1 if no == "managed" else int(no)
-            device = (name, no)
+            device = _parse_device(device)
 
         return super().__new__(cls, type=type, value=value, device=device)
 
     def __repr__(self):
-        value = self.short_value(maxshape=10)
-        fmt = pretty((value, "@type='%s'@" % self.type), max_width=120)
-        fmt = fmt.replace('"@', "")
-        fmt = fmt.replace('@"', "")
-        fmt = fmt.replace("\n", "\n   ")
-        return "xnd%s" % fmt
+        return _format_repr(self, "xnd")
 
     def copy_contiguous(self, dtype=None):
         if isinstance(dtype, str):
-            dtype = ndt(dtype)
+            dtype = _ndt_cached(dtype)
         return super().copy_contiguous(dtype=dtype)
 
     def reshape(self, *args, order=None):
+        if len(args) == 1 and isinstance(args[0], tuple):
+            args = args[0]
         return super()._reshape(args, order=order)
 
     @classmethod
     def empty(cls, type=None, device=None):
         if device is not None:
-            name, no = device.split(":")
-            no = -1 if no == "managed" else no
-            device = (name, int(no))
+            device = _parse_device(device)
+        if isinstance(type, str):
+            type = _ndt_cached(type)
 
         return super(xnd, cls).empty(type, device)
 
+    @classmethod
+    def empty_many(cls, type, n, device=None):
+        """Return a list of 'n' independent empty (zero initialized) xnd
+           objects of the same type.  'type' and 'device' are resolved once
+           for all objects.
+        """
+        if device is not None:
+            device = _parse_device(device)
+        if isinstance(type, str):
+            type = _ndt_cached(type)
+
+        empty = super(xnd, cls).empty
+        return [empty(type, device) for _ in range(n)]
+
     @classmethod
     def unsafe_from_data(cls, obj=None, type=None):
         """Return an xnd object that obtains memory from 'obj' via the
@@ -164,12 +233,15 @@ class xnd(Xnd):
            for passing a suitable type.
         """
         if isinstance(type, str):
-            type = ndt(type)
+            type = _ndt_cached(type)
         return cls._unsafe_from_data(obj, type)
 
 def typeof(v, dtype=None):
+    if dtype is None and isinstance(v, Xnd):
+        # The type of an xnd object is already known, skip the traversal.
+        return v.type
     if isinstance(dtype, str):
-        dtype = ndt(dtype)
+        dtype = _ndt_cached(dtype)
     return _typeof(v, dtype=dtype, shortcut=True)
 
 
@@ -177,101 +249,241 @@ def typeof(v, dtype=None):
 #                              array object
 # ======================================================================
 
+# Tables of the array methods that dispatch to gumath functions.  The
+# methods are generated after the class definition.
+_UNARY_OPERATORS = {
+  "__neg__": "negative",
+  "__invert__": "invert",
+  "__round__": "round",
+  "__trunc__": "trunc",
+  "__floor__": "floor",
+  "__ceil__": "ceil"
+}
+
+_BINARY_OPERATORS = {
+  "__eq__": "equal",
+  "__ne__": "not_equal",
+  "__lt__": "less",
+  "__le__": "less_equal",
+  "__ge__": "greater_equal",
+  "__gt__": "greater",
+  "__add__": "add",
+  "__sub__": "subtract",
+  "__mul__": "multiply",
+  "__truediv__": "divide",
+  "__floordiv__": "floor_divide",
+  "__mod__": "remainder",
+  "__divmod__": "divmod",
+  "__and__": "bitwise_and",
+  "__or__": "bitwise_or",
+  "__xor__": "bitwise_xor"
+}
+
+_INPLACE_OPERATORS = {
+  "__iadd__": "add",
+  "__isub__": "subtract",
+  "__imul__": "multiply",
+  "__itruediv__": "divide",
+  "__ifloordiv__": "floor_divide",
+  "__imod__": "remainder",
+  "__idivmod__": "divmod",
+  "__iand__": "bitwise_and",
+  "__ior__": "bitwise_or",
+  "__ixor__": "bitwise_xor"
+}
+
+_UNARY_METHODS = (
+  "copy", "acos", "acosh", "asin", "asinh", "atan", "atanh", "cbrt", "cos",
+  "cosh", "erf", "erfc", "exp", "exp2", "expm1", "fabs", "lgamma", "log",
+  "log10", "log1p", "log2", "logb", "nearbyint", "sin", "sinh", "sqrt",
+  "tan", "tanh", "tgamma"
+)
+
+_BINARY_METHODS = ("equaln",)
+
+# Names of the gumath functions that are called by the array methods.
+_OP_NAMES = frozenset(_UNARY_OPERATORS.values()) | \
+            frozenset(_BINARY_OPERATORS.values()) | \
+            frozenset(_UNARY_METHODS) | frozenset(_BINARY_METHODS)
+
+# NumPy dtype names that are spelled identically in ndtypes.
+_NP_DTYPE_TO_NDT = {
+  "bool": "bool",
+  "int8": "int8", "int16": "int16", "int32": "int32", "int64": "int64",
+  "uint8": "uint8", "uint16": "uint16", "uint32": "uint32", "uint64": "uint64",
+  "float16": "float16", "float32": "float32", "float64": "float64",
+  "complex64": "complex64", "complex128": "complex128"
+}
+
+def _to_numpy(np, values, what):
+    """Convert the 'inputs' or 'outputs' of __array_ufunc__ to ndarrays."""
+    if not all(isinstance(v, array) for v in values):
+        v = next(v for v in values if not isinstance(v, array))
+        raise TypeError(
+            "all %s must be 'xnd.array', got '%s'" % (what, type(v)))
+    return tuple([np.asarray(v) for v in values])
+
+@lru_cache(maxsize=1024)
+def _numpy_ndt(dtype_name, shape):
+    dtype = _NP_DTYPE_TO_NDT.get(dtype_name)
+    if dtype is None:
+        return None
+    return ndt(" * ".join([str(n) for n in shape] + [dtype]))
+
+def _numpy_type(v):
+    """Return the ndt of the ndarray 'v' if it can be derived directly from
+       the dtype and shape, otherwise None.  This requires a native, aligned
+       and C-contiguous array with a dtype in _NP_DTYPE_TO_NDT.
+    """
+    flags = v.flags
+    if not (flags.c_contiguous and flags.aligned and v.dtype.isnative):
+        return None
+    return _numpy_ndt(v.dtype.name, v.shape)
+
+def _from_ufunc_result(cls, v):
+    """Wrap an ndarray returned by a NumPy ufunc.  NumPy outputs are usually
+       native and C-contiguous, so the type can be built directly from the
+       shape instead of translating the PEP-3118 format string.
+    """
+    if isinstance(v, array._np.ndarray):
+        t = _numpy_type(v)
+        if t is not None:
+            return cls._unsafe_from_data(v, t)
+    return cls.from_buffer(v)
+
+# Maps a tuple of operand devices to the gumath module that handles them.
+_MODULES = {}
+
+def _resolve_module(devices):
+    m = _MODULES.get(devices)
+    if m is not None:
+        return m
+
+    if devices == ("cuda:managed",) or \
+       devices == ("cuda:managed", "cuda:managed"):
+        import gumath.cuda as m
+    else:
+        import gumath.functions as m
+
+    for name in _OP_NAMES:
+        if hasattr(m, name):
+            array._bound[devices, name] = getattr(m, name)
+        # Optional kernels for C-contiguous operands of the same shape.
+        if hasattr(m, name + "_contig"):
+            array._bound_contig[devices, name] = getattr(m, name + "_contig")
+
+    _MODULES[devices] = m
+    return m
+
 class array(xnd):
     """Extended array type that relies on gumath for the array functions."""
 
-    _functions = None
-    _cuda = None
+    # The type of an xnd object never changes, so shape and strides are
+    # computed on first access.
+    __slots__ = ("_shape", "_strides")
+
     _np = None
+    # Maps (devices, name) to the gumath function for these operand devices.
+    _bound = {}
+    _bound_contig = {}
 
     @property
     def shape(self):
-        return self.type.shape
+        try:
+            return self._shape
+        except AttributeError:
+            self._shape = self.type.shape
+            return self._shape
 
     @property
     def strides(self):
-        return self.type.strides
+        try:
+            return self._strides
+        except AttributeError:
+            self._strides = self.type.strides
+            return self._strides
 
     def __repr__(self):
-        value = self.short_value(maxshape=10)
-        fmt = pretty((value, "@type='%s'@" % self.type), max_width=120)
-        fmt = fmt.replace('"@', "")
-        fmt = fmt.replace('@"', "")
-        fmt = fmt.replace("\n", "\n     ")
-        return "array%s" % fmt
+        return _format_repr(self, "array")
 
     def tolist(self):
         return self.value
 
+    @classmethod
+    def from_numpy(cls, arr):
+        """Return an array that shares the memory of the NumPy array 'arr'.
+           For native, C-contiguous arrays of the common numeric dtypes the
+           type is derived from 'arr.dtype' and 'arr.shape' (and cached)
+           instead of being translated from the buffer's format string.
+        """
+        np = array._np
+        if np is None:
+            import numpy as np
+            array._np = np
+
+        if not isinstance(arr, np.ndarray):
+            raise TypeError("expected 'numpy.ndarray', got '%s'" % type(arr))
+
+        t = _numpy_type(arr)
+        if t is None:
+            return cls.from_buffer(arr)
+        return cls._unsafe_from_data(arr, t)
+
     def _get_module(self, *devices):
-        if all(d == "cuda:managed" for d in devices):
-            if array._cuda is None:
-                import gumath.cuda
-                array._cuda = gumath.cuda
-            return array._cuda
-        else:
-            if array._functions is None:
-                import gumath.functions
-                array._functions = gumath.functions
-            return array._functions
+        return _resolve_module(devices)
 
     def _call_unary(self, name, out=None):
-        m = self._get_module(self.device)
-        return getattr(m, name)(self, out=out, cls=array)
+        key = ((self.device,), name)
+        f = array._bound.get(key)
+        if f is None:
+            f = getattr(self._get_module(*key[0]), name)
+        return f(self, out=out, cls=array)
 
     def _call_binary(self, name, other, out=None):
-        m = self._get_module(self.device, other.device)
-        return getattr(m, name)(self, other, out=out, cls=array)
+        key = ((self.device, other.device), name)
+        f = array._bound.get(key)
+        if f is None:
+            f = getattr(self._get_module(*key[0]), name)
+        if array._bound_contig and out is None and key in array._bound_contig:
+            t, u = self.type, other.type
+            if t.is_c_contiguous() and u.is_c_contiguous() and \
+               t.shape == u.shape:
+                f = array._bound_contig[key]
+        return f(self, other, out=out, cls=array)
 
     def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
-        if array._np is None:
-            import numpy
-            array._np = numpy
         np = array._np
+        if np is None:
+            import numpy as np
+            array._np = np
 
-        np_inputs = []
-        for v in inputs:
-            if not isinstance(v, array):
-                raise TypeError(
-                    "all inputs must be 'xnd.array', got '%s'" % type(v))
-            np_inputs.append(np.array(v, copy=False))
+        np_inputs = _to_numpy(np, inputs, "inputs")
 
-        out = kwargs.pop('out', None)
+        out = kwargs.get('out')
         if out is not None:
-            np_outputs = []
-            for v in out:
-                if not isinstance(v, array):
-                    raise TypeError(
-                        "all outputs must be 'xnd.array', got '%s'" % type(v))
-                np_outputs.append(np.array(v, copy=False))
-            kwargs["out"] = np_outputs
+            kwargs["out"] = _to_numpy(np, out, "outputs")
 
         np_self = np_inputs[0]
         np_res = np_self.__array_ufunc__(ufunc, method, *np_inputs, **kwargs)
 
         if out is None:
             if isinstance(np_res, tuple):
-                return tuple(xnd.from_buffer(v) for v in np_res)
+                return tuple(_from_ufunc_result(xnd, v) for v in np_res)
             else:
-                return array.from_buffer(np_res)
+                return _from_ufunc_result(array, np_res)
         else:
             return out
 
     def __bool__(self):
         raise ValueError("the truth value is ambiguous")
 
-    def __neg__(self):
-        return self._call_unary("negative")
-
     def __pos__(self):
-        return self.copy()
+        # Zero-copy view on the same memory.
+        return self[()]
 
     def __abs__(self):
         raise NotImplementedError("abs() is not implemented")
 
-    def __invert__(self):
-        return self._call_unary("invert")
-
     def __complex__(self):
         raise TypeError("complex() is not supported")
 
@@ -284,60 +496,9 @@ class array(xnd):
     def __index__(self):
         raise TypeError("index() is not supported")
 
-    def __round__(self):
-        return self._call_unary("round")
-
-    def __trunc__(self):
-        return self._call_unary("trunc")
-
-    def __floor__(self):
-        return self._call_unary("floor")
-
-    def __ceil__(self):
-        return self._call_unary("ceil")
-
-    def __eq__(self, other):
-        return self._call_binary("equal", other)
-
-    def __ne__(self, other):
-        return self._call_binary("not_equal", other)
-
-    def __lt__(self, other):
-        return self._call_binary("less", other)
-
-    def __le__(self, other):
-        return self._call_binary("less_equal", other)
-
-    def __ge__(self, other):
-        return self._call_binary("greater_equal", other)
-
-    def __gt__(self, other):
-        return self._call_binary("greater", other)
-
-    def __add__(self, other):
-        return self._call_binary("add", other)
-
-    def __sub__(self, other):
-        return self._call_binary("subtract", other)
-
-    def __mul__(self, other):
-        return self._call_binary("multiply", other)
-
     def __matmul__(self, other):
         raise NotImplementedError("matrix multiplication is not implemented")
 
-    def __truediv__(self, other):
-        return self._call_binary("divide", other)
-
-    def __floordiv__(self, other):
-        return self._call_binary("floor_divide", other)
-
-    def __mod__(self, other):
-        return self._call_binary("remainder", other)
-
-    def __divmod__(self, other):
-        return self._call_binary("divmod", other)
-
     def __pow__(self, other):
         raise NotImplementedError("power is not implemented")
 
@@ -347,39 +508,9 @@ class array(xnd):
     def __rshift__(self, other):
         raise TypeError("the '>>' operator is not supported")
 
-    def __and__(self, other):
-        return self._call_binary("bitwise_and", other)
-
-    def __or__(self, other):
-        return self._call_binary("bitwise_or", other)
-
-    def __xor__(self, other):
-        return self._call_binary("bitwise_xor", other)
-
-    def __iadd__(self, other):
-        return self._call_binary("add", other, out=self)
-
-    def __isub__(self, other):
-        return self._call_binary("subtract", other, out=self)
-
-    def __imul__(self, other):
-        return self._call_binary("multiply", other, out=self)
-
     def __imatmul__(self, other):
         raise NotImplementedError("inplace matrix multiplication is not implemented")
 
-    def __itruediv__(self, other):
-        return self._call_binary("divide", other, out=self)
-
-    def __ifloordiv__(self, other):
-        return self._call_binary("floor_divide", other, out=self)
-
-    def __imod__(self, other):
-        return self._call_binary("remainder", other, out=self)
-
-    def __idivmod__(self, other):
-        return self._call_binary("divmod", other, out=self)
-
     def __ipow__(self, other):
         raise NotImplementedError("inplace power is not implemented")
 
@@ -389,101 +520,50 @@ class array(xnd):
     def __irshift__(self, other):
         raise TypeError("the inplace '>>' operator is not supported")
 
-    def __iand__(self, other):
-        return self._call_binary("bitwise_and", other, out=self)
-
-    def __ior__(self, other):
-        return self._call_binary("bitwise_or", other, out=self)
-
-    def __ixor__(self, other):
-        return self._call_binary("bitwise_xor", other, out=self)
-
-    def copy(self, out=None):
-        return self._call_unary("copy", out=out)
-
-    def acos(self, out=None):
-        return self._call_unary("acos", out=out)
-
-    def acosh(self, out=None):
-        return self._call_unary("acosh", out=out)
-
-    def asin(self, out=None):
-        return self._call_unary("asin", out=out)
-
-    def asinh(self, out=None):
-        return self._call_unary("asinh", out=out)
-
-    def atan(self, out=None):
-        return self._call_unary("atan", out=out)
-
-    def atanh(self, out=None):
-        return self._call_unary("atanh", out=out)
-
-    def cbrt(self, out=None):
-        return self._call_unary("cbrt", out=out)
-
-    def cos(self, out=None):
-        return self._call_unary("cos", out=out)
-
-    def cosh(self, out=None):
-        return self._call_unary("cosh", out=out)
-
-    def erf(self, out=None):
-        return self._call_unary("erf", out=out)
-
-    def erfc(self, out=None):
-        return self._call_unary("erfc", out=out)
-
-    def exp(self, out=None):
-        return self._call_unary("exp", out=out)
-
-    def exp2(self, out=None):
-        return self._call_unary("exp2", out=out)
-
-    def expm1(self, out=None):
-        return self._call_unary("expm1", out=out)
-
-    def fabs(self, out=None):
-        return self._call_unary("fabs", out=out)
-
-    def lgamma(self, out=None):
-        return self._call_unary("lgamma", out=out)
-
-    def log(self, out=None):
-        return self._call_unary("log", out=out)
 
-    def log10(self, out=None):
-        return self._call_unary("log10", out=out)
+def _array_method(f, name):
+    f.__name__ = name
+    f.__qualname__ = "array.%s" % name
+    return f
 
-    def log1p(self, out=None):
-        return self._call_unary("log1p", out=out)
+def _make_unary_operator(name, fname):
+    def f(self):
+        return self._call_unary(fname)
+    return _array_method(f, name)
 
-    def log2(self, out=None):
-        return self._call_unary("log2", out=out)
+def _make_binary_operator(name, fname):
+    def f(self, other):
+        return self._call_binary(fname, other)
+    return _array_method(f, name)
 
-    def logb(self, out=None):
-        return self._call_unary("logb", out=out)
+def _make_inplace_operator(name, fname):
+    def f(self, other):
+        return self._call_binary(fname, other, out=self)
+    return _array_method(f, name)
 
-    def nearbyint(self, out=None):
-        return self._call_unary("nearbyint", out=out)
+def _make_unary_method(name):
+    def f(self, out=None):
+        return self._call_unary(name, out=out)
+    return _array_method(f, name)
 
-    def sin(self, out=None):
-        return self._call_unary("sin", out=out)
+def _make_binary_method(name):
+    def f(self, other, out=None):
+        return self._call_binary(name, other, out=out)
+    return _array_method(f, name)
 
-    def sinh(self, out=None):
-        return self._call_unary("sinh", out=out)
+for _name, _fname in _UNARY_OPERATORS.items():
+    setattr(array, _name, _make_unary_operator(_name, _fname))
 
-    def sqrt(self, out=None):
-        return self._call_unary("sqrt", out=out)
+for _name, _fname in _BINARY_OPERATORS.items():
+    setattr(array, _name, _make_binary_operator(_name, _fname))
 
-    def tan(self, out=None):
-        return self._call_unary("tan", out=out)
+for _name, _fname in _INPLACE_OPERATORS.items():
+    setattr(array, _name, _make_inplace_operator(_name, _fname))
 
-    def tanh(self, out=None):
-        return self._call_unary("tanh", out=out)
+for _name in _UNARY_METHODS:
+    setattr(array, _name, _make_unary_method(_name))
 
-    def tanh(self, out=None):
-        return self._call_unary("tgamma", out=out)
+for _name in _BINARY_METHODS:
+    setattr(array, _name, _make_binary_method(_name))
 
-    def equaln(self, other, out=None):
-        return self._call_binary("equaln", other, out=out)
+del _name, _fname